@@ -3,11 +3,16 @@ import json
 import time
 import re
 import sys
+import bisect
+import functools
 import random
 import uuid
-import concurrent.futures
+import queue
 import threading
+import collections
+import socket
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 from urllib3.util.retry import Retry
 
 # ==========================================
@@ -18,8 +23,25 @@ from urllib3.util.retry import Retry
 GRAPHQL_URL = "https://graphql.nova.is/graphql"
 
 # 并发设置
-CONCURRENT_WORKERS = 100  # 并发线程数（一次请求多少个）
-BATCH_DELAY = 2         # 每批次间隔时间（秒），避免瞬间请求过多导致IP被Ban
+# 并发线程数（一次请求多少个）
+# 实际吞吐由下方速率上限决定: 线程数只需覆盖 每秒请求数 x 单次请求耗时，多出的线程在限速器上排队等待
+CONCURRENT_WORKERS = 100
+SEARCH_BATCH_SIZE = 50  # 每次查询请求返回的号码数量 (GraphQL count 参数)
+SEARCH_QUERY_ALIASES = 4  # 单个 HTTP 请求内合并的查询个数 (GraphQL 别名 q0, q1, ...)
+# 全局速率上限（次查询/秒），避免请求过多导致IP被Ban
+# 按 availablePhoneNumbers 查询次数计: 每个 HTTP 请求消耗 SEARCH_QUERY_ALIASES 次，
+# 每次查询返回 SEARCH_BATCH_SIZE 个号码
+# 默认 50 与原先每秒 50 个单查询请求的查询速率一致，按默认 4 个别名折合 12.5 个 HTTP 请求/秒
+MAX_QUERIES_PER_SECOND = 50
+THROTTLE_PAUSE = 5      # 服务端返回 429/5xx 时暂停发起查询的时间（秒），同时速率减半
+PROGRESS_INTERVAL = 0.1  # 进度行刷新间隔（秒）
+SEEN_CACHE_SIZE = 200000  # 记录已检查号码的数量上限，超出后淘汰最久未出现的号码
+
+# 号码类型 (服务端预筛选)
+SEARCH_NUMBER_TYPE = "Normal"       # 默认查询的号码类型
+AUTO_DISCOVER_NUMBER_TYPE = True    # 启动时通过 GraphQL 内省查找服务端是否提供靓号类型
+PREFERRED_NUMBER_TYPES = ["Gold", "Golden", "Premium", "Special", "Vip"]  # 按优先级排列，不区分大小写
+FILTER_FIELD_NAMES = ["pattern", "contains", "startsWith", "endsWith", "search", "filter"]  # 可能的服务端号码筛选字段，不区分大小写
 
 # ==========================================
 # [新增] 用户自定义筛选规则配置
@@ -60,140 +82,466 @@ BASE_HEADERS = {
 print_lock = threading.Lock()        # 确保打印不乱序
 allow_printing = threading.Event()   # 控制是否允许打印进度
 allow_printing.set()                 # 默认允许打印
+allow_scanning = threading.Event()   # 控制工作线程是否继续发起查询 (发现靓号暂停时清除)
+allow_scanning.set()
+stop_event = threading.Event()       # 通知工作线程退出
+
+stats_lock = threading.Lock()        # 保护扫描计数
+total_scanned = 0                    # 总计扫描的号码数
+total_unique = 0                     # 其中去重后实际检查的号码数
+active_requests = 0                  # 正在进行中的查询数 (暂停时等待其归零)
+
+_SEEN = collections.OrderedDict()    # 本次会话已检查过的号码 (按最近出现排序)
+_SEEN_LOCK = threading.Lock()
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限速器
+    平均每秒发放 rate 个令牌，最多积攒 burst 个，取不到令牌时等待
+    服务端限流/报错时调用 throttle() 暂停并降速，请求成功时调用 recover() 逐步恢复
+    """
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self, cost=1):
+        """取 cost 个令牌，必要时阻塞等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    # 暂停期间不积攒令牌
+                    elapsed = now - max(self.updated, self.paused_until)
+                    self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+                    self.updated = now
+                    if self.tokens >= cost:
+                        self.tokens -= cost
+                        return
+                    wait = (cost - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self):
+        """服务端返回 429/5xx: 清空令牌、暂停 THROTTLE_PAUSE 秒并把速率减半"""
+        with self.lock:
+            now = time.monotonic()
+            # 同一轮暂停内多个线程同时报错只退避一次
+            if now < self.paused_until:
+                return
+            self.tokens = 0
+            self.rate = max(self.max_rate / 64, self.rate / 2)
+            self.paused_until = now + THROTTLE_PAUSE
+
+    def recover(self):
+        """请求成功: 速率每次回升上限的 1/20，直到恢复到上限"""
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+# 所有工作线程共享同一个限速器，单个 HTTP 请求的消耗为 SEARCH_QUERY_ALIASES 个令牌
+rate_limiter = TokenBucket(MAX_QUERIES_PER_SECOND, max(SEARCH_QUERY_ALIASES, int(MAX_QUERIES_PER_SECOND)))
 
 # ==========================================
 # 核心筛选规则逻辑
 # ==========================================
 
+# 预先生成顺子序列 (正向/反向 5、4、3 位)
+_FORWARD_SEQ = "0123456789"
+_BACKWARD_SEQ = "9876543210"
+
+_FWD5 = tuple(_FORWARD_SEQ[i:i+5] for i in range(len(_FORWARD_SEQ) - 4))
+_BWD5 = tuple(_BACKWARD_SEQ[i:i+5] for i in range(len(_BACKWARD_SEQ) - 4))
+_FWD4 = tuple(_FORWARD_SEQ[i:i+4] for i in range(len(_FORWARD_SEQ) - 3))
+_BWD4 = tuple(_BACKWARD_SEQ[i:i+4] for i in range(len(_BACKWARD_SEQ) - 3))
+_FWD3 = tuple(_FORWARD_SEQ[i:i+3] for i in range(len(_FORWARD_SEQ) - 2))
+_BWD3 = tuple(_BACKWARD_SEQ[i:i+3] for i in range(len(_BACKWARD_SEQ) - 2))
+
+# 规则名 -> 匹配原因, {} 处填入命中的数字片段
+_RULE_REASONS = {
+    "custom": "符合自定义目标: 包含 '{}'",
+    "a4":     "符合规则: A4连号 (发现连续4位重复数字)",
+    "a3":     "符合规则: A3连号 (发现连续3位重复数字)",
+    "fwd5":   "符合规则: 正向5位连号 ({})",
+    "bwd5":   "符合规则: 反向5位连号 ({})",
+    "fwd4":   "符合规则: 正向4位连号 ({})",
+    "bwd4":   "符合规则: 反向4位连号 ({})",
+    "fwd3":   "符合规则: 正向3位连号 ({})",
+    "bwd3":   "符合规则: 反向3位连号 ({})",
+}
+
+def _trie_pattern(words):
+    """
+    把一组字面量合并成前缀树形状的正则，公共前缀只比较一次
+    (效果类似 Aho-Corasick: 不论目标有多少个，每个位置只走一遍前缀树)
+    只用于判断"是否包含其中任意一个"，因此某个词结束后其更长的延伸可以省略
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            if node.get("") is not None:
+                break
+            node = node.setdefault(ch, {})
+        node.clear()
+        node[""] = True
+
+    def walk(node):
+        if "" in node:
+            return ""
+        branches = [re.escape(ch) + walk(child) for ch, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")"
+
+    return walk(trie)
+
+def _gated(words, alternatives):
+    """
+    在一组规则前加一道前缀树门槛: 先扫描一次号码判断是否包含 words 中任意一个，
+    绝大多数普通号码在这里一次失败，不必逐条规则扫描整条号码
+    words 须覆盖这组规则的全部可能命中
+    """
+    if len(alternatives) <= 1:
+        return alternatives
+    gate = f"(?=.*?{_trie_pattern(words)})"
+    return [gate + "(?:" + "|".join(alternatives) + ")"]
+
+def _build_master_re():
+    """
+    根据配置开关，把所有启用的规则拼成一个总正则
+    每条规则包在 (?=.*?...) 前瞻里并按优先级排列，
+    匹配结果与逐条检查时的优先级保持一致；
+    所有规则之前有一道总门槛，不命中的号码只需扫描一遍
+    返回: (总正则, {命名分组: 匹配原因模板})
+    """
+    reasons = {}
+
+    def lookahead(group, rule, pattern):
+        reasons[group] = _RULE_REASONS[rule]
+        return f"(?=.*?(?P<{group}>{pattern}))"
+
+    alternatives = []
+
+    # 自定义目标逐个成组，保证列表靠前的目标优先
+    custom = [lookahead(f"custom{i}", "custom", re.escape(target)) for i, target in enumerate(CUSTOM_TARGETS)]
+    alternatives += _gated(CUSTOM_TARGETS, custom)
+
+    if ENABLE_A4:
+        alternatives.append(lookahead("a4", "a4", r"(?P<a4d>\d)(?P=a4d){3}"))
+    if ENABLE_A3:
+        alternatives.append(lookahead("a3", "a3", r"(?P<a3d>\d)(?P=a3d){2}"))
+
+    # 顺子: 更长的顺子必然包含同方向的更短顺子，
+    # 所以用已启用的最短顺子集合作为整组顺子规则的门槛
+    runs = [lookahead("fwd5", "fwd5", "|".join(_FWD5)), lookahead("bwd5", "bwd5", "|".join(_BWD5))]
+    shortest_runs = _FWD5 + _BWD5
+    if ENABLE_ABCD:
+        runs += [lookahead("fwd4", "fwd4", "|".join(_FWD4)), lookahead("bwd4", "bwd4", "|".join(_BWD4))]
+        shortest_runs = _FWD4 + _BWD4
+    if ENABLE_ABC:
+        runs += [lookahead("fwd3", "fwd3", "|".join(_FWD3)), lookahead("bwd3", "bwd3", "|".join(_BWD3))]
+        shortest_runs = _FWD3 + _BWD3
+    alternatives += _gated(shortest_runs, runs)
+
+    # 总门槛: 一次扫描判断号码是否可能命中任意规则 (自定义目标 / 最短连号 / 最短顺子)，
+    # 普通号码在这里一遍扫描即失败，不会再被每条规则的前瞻逐条重扫
+    gate_parts = []
+    if CUSTOM_TARGETS:
+        gate_parts.append(_trie_pattern(CUSTOM_TARGETS))
+    if ENABLE_A3:
+        gate_parts.append(r"(?P<gd>\d)(?P=gd){2}")
+    elif ENABLE_A4:
+        gate_parts.append(r"(?P<gd>\d)(?P=gd){3}")
+    gate_parts.append(_trie_pattern(shortest_runs))
+    gate = "(?=.*?(?:" + "|".join(gate_parts) + "))"
+
+    # 号码均为 ASCII 数字，编译为 bytes 正则，直接匹配响应中的原始字节
+    # MULTILINE: 批量检查时 ^ 可匹配拼接文本中每个号码的开头
+    pattern = "^" + gate + "(?:" + "|".join(alternatives) + ")"
+    return re.compile(pattern.encode(), re.MULTILINE), reasons
+
+# 导入时按配置一次性构建，开关判断全部固化进正则，热路径上不再检查任何开关
+# (总正则, 匹配原因) 放在同一个元组里，重建时一次替换，并发读取不会错配
+_MASTER_RULES = _build_master_re()
+
+def rebuild_rules():
+    """
+    运行期修改 CUSTOM_TARGETS / ENABLE_* 后调用，按新配置重建总正则
+    同时清空已检查号码记录，避免旧规则下被跳过的号码不再检查
+    """
+    global _MASTER_RULES
+    _MASTER_RULES = _build_master_re()
+    with _SEEN_LOCK:
+        _SEEN.clear()
+
 def check_number_rules(phone_number):
     """
     检查号码是否符合规则
+    phone_number 为 bytes (如 b"7771234")，传入 str 时会先编码
     """
     if not phone_number:
         return False, "号码为空"
 
-    phone_number = str(phone_number)
-    
-    # 1. 优先检查：用户自定义的特定目标
-    for target in CUSTOM_TARGETS:
-        if target in phone_number:
-            return True, f"符合自定义目标: 包含 '{target}'"
-    
-    # 2. 检查：A4 连号
-    if ENABLE_A4 and re.search(r'(\d)\1{3,}', phone_number):
-        return True, f"符合规则: A4连号 (发现连续4位重复数字)"
-
-    # 3. 检查：A3 连号
-    if ENABLE_A3 and re.search(r'(\d)\1{2,}', phone_number):
-        return True, f"符合规则: A3连号 (发现连续3位重复数字)"
-
-    # 准备顺子序列
-    forward_seq = "0123456789"
-    backward_seq = "9876543210"
-
-    # 4. 检查：5位连续数字
-    for i in range(len(forward_seq) - 4):
-        if forward_seq[i:i+5] in phone_number:
-            return True, f"符合规则: 正向5位连号 ({forward_seq[i:i+5]})"
-    for i in range(len(backward_seq) - 4):
-        if backward_seq[i:i+5] in phone_number:
-            return True, f"符合规则: 反向5位连号 ({backward_seq[i:i+5]})"
-
-    # 5. 检查：ABCD (4位顺子)
-    if ENABLE_ABCD:
-        for i in range(len(forward_seq) - 3):
-            if forward_seq[i:i+4] in phone_number:
-                return True, f"符合规则: 正向4位连号 ({forward_seq[i:i+4]})"
-        for i in range(len(backward_seq) - 3):
-            if backward_seq[i:i+4] in phone_number:
-                return True, f"符合规则: 反向4位连号 ({backward_seq[i:i+4]})"
-
-    # 6. 检查：ABC (3位顺子)
-    if ENABLE_ABC:
-        for i in range(len(forward_seq) - 2):
-            if forward_seq[i:i+3] in phone_number:
-                return True, f"符合规则: 正向3位连号 ({forward_seq[i:i+3]})"
-        for i in range(len(backward_seq) - 2):
-            if backward_seq[i:i+3] in phone_number:
-                return True, f"符合规则: 反向3位连号 ({backward_seq[i:i+3]})"
+    if isinstance(phone_number, str):
+        phone_number = phone_number.encode()
+
+    # 单次正则扫描完成全部规则检查，命名分组指明命中的规则
+    master_re, reasons = _MASTER_RULES
+    m = master_re.match(phone_number)
+    if m:
+        return True, reasons[m.lastgroup].format(m.group(m.lastgroup).decode())
 
     return False, "普通号码"
 
+def check_numbers_batch(phone_numbers):
+    """
+    批量检查号码: 用换行拼接成一段文本，总正则只扫描一次
+    phone_numbers 为 bytes 列表 (即响应中提取出的原始号码)
+    返回: [(号码 str, 匹配原因), ...] 仅包含符合规则的号码
+    """
+    numbers = [n for n in phone_numbers if n]
+    if not numbers:
+        return []
+
+    # 换行不会出现在任何规则中，且 . 不跨行，各号码之间互不干扰
+    blob = b"\n".join(numbers)
+
+    # 长度前缀和: 每个号码在拼接文本中的起始偏移
+    starts = [0]
+    for number in numbers[:-1]:
+        starts.append(starts[-1] + len(number) + 1)
+
+    master_re, reasons = _MASTER_RULES
+    hits = []
+    for m in master_re.finditer(blob):
+        index = bisect.bisect_right(starts, m.start()) - 1
+        reason = reasons[m.lastgroup].format(m.group(m.lastgroup).decode())
+        hits.append((numbers[index].decode(), reason))
+    return hits
+
 # ==========================================
 # API 客户端类 (支持并发Session)
 # ==========================================
 
+# 号码查询语句: 用别名在一个查询文档里放多个 availablePhoneNumbers 根字段，
+# 一次网络往返、一次解析即可取回多组号码
+_SEARCH_QUERY = "query AvailablePhoneNumbers($input: SearchPhoneNumber) {\n" + "".join(
+    f"""  q{i}: availablePhoneNumbers(input: $input) {{
+    phoneNumber
+    type
+    __typename
+  }}
+""" for i in range(SEARCH_QUERY_ALIASES)
+) + "}"
+
+@functools.lru_cache(maxsize=None)
+def _search_body(number_type, count):
+    """
+    生成号码查询的请求体 (已序列化的 JSON bytes)
+    参数组合固定，按 (号码类型, 数量) 缓存，热路径上不再重复构造与编码
+    """
+    payload = {
+        "operationName": "AvailablePhoneNumbers",
+        "variables": {
+            "input": {
+                "count": count,
+                "type": number_type
+            }
+        },
+        "query": _SEARCH_QUERY
+    }
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+# 直接从响应字节中提取号码，搜索热路径无需完整解析 JSON
+_PHONE_NUMBER_RE = re.compile(rb'"phoneNumber"\s*:\s*"([^"]+)"')
+
+# TCP keepalive 探测参数 (秒 / 次)
+# 系统默认要空闲 7200 秒才发第一个探测包，远晚于中间设备回收空闲连接的时间，这里显式调短
+_KEEPALIVE_OPTIONS = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)] + [
+    (socket.IPPROTO_TCP, getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+]
+
+class KeepAliveAdapter(HTTPAdapter):
+    """
+    在 urllib3 默认 socket 选项 (已含 TCP_NODELAY) 之上开启 TCP keepalive，
+    空闲 30 秒起开始探测，让连接池里的空闲长连接不被中间设备静默断开，复用时少踩失效连接
+    (不支持 TCP_KEEPIDLE 等选项的平台只开启 SO_KEEPALIVE，沿用系统默认探测间隔)
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + _KEEPALIVE_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+def _make_session(retry_strategy, pool_maxsize):
+    """
+    创建带连接池的 Session，实现TCP复用
+    """
+    session = requests.Session()
+    adapter = KeepAliveAdapter(
+        pool_connections=CONCURRENT_WORKERS, 
+        pool_maxsize=pool_maxsize,
+        max_retries=retry_strategy
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    
+    session.headers.update(BASE_HEADERS)
+    return session
+
 class NovaClient:
     def __init__(self):
-        self.session = requests.Session()
-        
-        # 配置连接池，实现TCP复用
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+        # 锁定/下单等流程: 失败需要重试
+        self.session = _make_session(
+            Retry(
+                total=3,
+                backoff_factor=1,
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
+            pool_maxsize=CONCURRENT_WORKERS
         )
-        adapter = HTTPAdapter(
-            pool_connections=CONCURRENT_WORKERS, 
-            pool_maxsize=CONCURRENT_WORKERS,
-            max_retries=retry_strategy
+        
+        # 号码查询热路径: 失败直接丢弃，马上换下一批号码，不在重试退避上空等
+        self.search_session = _make_session(
+            Retry(total=0),
+            pool_maxsize=CONCURRENT_WORKERS
         )
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
         
-        self.session.headers.update(BASE_HEADERS)
-
-    def get_dynamic_headers(self):
-        """生成动态请求头"""
-        headers = BASE_HEADERS.copy()
-        random_uuid = str(uuid.uuid4())
-        headers["request-context"] = f"appId=cid-v1:{random_uuid}"
-        return headers
+        # 当前查询的号码类型，可由 discover_number_type 切换
+        self.number_type = SEARCH_NUMBER_TYPE
+        # 内省发现的服务端筛选字段 (如 pattern/contains)，仅用于提示
+        self.filter_fields = []
 
-    def post_graphql(self, payload, headers=None):
-        """发送 GraphQL 请求"""
+    def post_graphql_response(self, payload, headers=None, session=None):
+        """
+        发送 GraphQL 请求，返回 Response 对象 (网络异常时为 None)，不检查状态码
+        payload 为 dict 时由 requests 序列化；为 bytes 时视为已编码好的 JSON 原样发送
+        基础请求头 (含 content-type) 已挂在 Session 上，这里只附加动态的 request-context，
+        requests 会自动与 Session 请求头合并
+        session 默认为带重试的 self.session
+        """
         try:
+            if session is None:
+                session = self.session
             if headers is None:
-                headers = self.get_dynamic_headers()
+                headers = {"request-context": f"appId=cid-v1:{uuid.uuid4()}"}
             
-            response = self.session.post(
+            is_raw = isinstance(payload, bytes)
+            response = session.post(
                 GRAPHQL_URL, 
-                json=payload, 
+                data=payload if is_raw else None, 
+                json=None if is_raw else payload, 
                 headers=headers, 
                 timeout=10
             )
-            response.raise_for_status()
-            return response.json()
+            return response
         except Exception as e:
             return None
 
-    def search_single_number(self):
-        """[并发任务] 执行一次号码查询"""
+    def post_graphql_raw(self, payload, headers=None, session=None):
+        """发送 GraphQL 请求，返回未解析的响应体 (bytes)，失败时为 None"""
+        response = self.post_graphql_response(payload, headers, session)
+        if response is None or not response.ok:
+            return None
+        return response.content
+
+    def post_graphql(self, payload, headers=None):
+        """发送 GraphQL 请求"""
+        content = self.post_graphql_raw(payload, headers)
+        if content is None:
+            return None
+        
+        try:
+            return json.loads(content)
+        except ValueError:
+            return None
+
+    def discover_number_type(self):
+        """
+        [启动时调用] 通过 GraphQL 内省读取 SearchPhoneNumber.type 的枚举值
+        若服务端提供 PREFERRED_NUMBER_TYPES 中的靓号类型，则切换 self.number_type，
+        让服务端预先筛选，减少拉取后被丢弃的普通号码
+        同时把名称属于 FILTER_FIELD_NAMES 的输入字段记入 self.filter_fields；
+        这类字段的取值格式无从得知，只提示不自动使用
+        返回: 服务端支持的全部号码类型；type 字段不是枚举时为空列表，内省被禁用或失败时为 None
+        """
         payload = {
-            "operationName": "AvailablePhoneNumbers",
-            "variables": {
-                "input": {
-                    "count": 1,
-                    "type": "Normal"
+            "operationName": "SearchPhoneNumberType",
+            "variables": {},
+            "query": """query SearchPhoneNumberType {
+              __type(name: "SearchPhoneNumber") {
+                inputFields {
+                  name
+                  type {
+                    kind
+                    name
+                    enumValues { name }
+                    ofType { kind name enumValues { name } }
+                  }
                 }
-            },
-            "query": """query AvailablePhoneNumbers($input: SearchPhoneNumber) {
-              availablePhoneNumbers(input: $input) {
-                phoneNumber
-                type
-                __typename
               }
             }"""
         }
 
         data = self.post_graphql(payload)
         
-        if data and 'data' in data and 'availablePhoneNumbers' in data['data']:
-            numbers_list = data['data']['availablePhoneNumbers']
-            if numbers_list and len(numbers_list) > 0:
-                return numbers_list[0]['phoneNumber'], data
+        try:
+            input_fields = data['data']['__type']['inputFields']
+        except (TypeError, KeyError):
+            return None
+
+        filter_names = {name.lower() for name in FILTER_FIELD_NAMES}
+        self.filter_fields = [
+            field['name'] for field in input_fields or []
+            if field.get('name', '').lower() in filter_names
+        ]
+
+        available_types = []
+        for field in input_fields or []:
+            if field.get('name') != 'type':
+                continue
+            field_type = field.get('type') or {}
+            # 字段类型可能被 NON_NULL 包裹一层
+            enum_values = field_type.get('enumValues') or (field_type.get('ofType') or {}).get('enumValues') or []
+            available_types = [value['name'] for value in enum_values]
+
+        for preferred in PREFERRED_NUMBER_TYPES:
+            for number_type in available_types:
+                if number_type.lower() == preferred.lower():
+                    self.number_type = number_type
+                    return available_types
         
-        return None, None
+        return available_types
+
+    def search_numbers_batch(self, count=SEARCH_BATCH_SIZE):
+        """
+        [并发任务] 执行一次号码查询
+        请求内含 SEARCH_QUERY_ALIASES 个别名查询，每个取回 count 个号码
+        返回: (号码列表 [bytes, ...], 原始响应体 bytes, HTTP 状态码)
+        网络异常时状态码为 None；状态码非 2xx 时号码列表为空
+        """
+        response = self.post_graphql_response(
+            _search_body(self.number_type, count),
+            session=self.search_session
+        )
+        
+        if response is None:
+            return [], None, None
+        if not response.ok:
+            return [], None, response.status_code
+        
+        # 号码保持 bytes，直接交给 bytes 正则检查
+        content = response.content
+        numbers = _PHONE_NUMBER_RE.findall(content)
+        if numbers:
+            return numbers, content, response.status_code
+        
+        return [], None, response.status_code
 
     # =========================================================
     # 以下为全功能方法（锁定、提交信息、确认订单）
@@ -429,88 +777,205 @@ class NovaClient:
 # 主程序逻辑
 # ==========================================
 
+def filter_unseen(numbers):
+    """
+    过滤掉本次会话中已经检查过的号码，并把新号码记入 _SEEN
+    记录超过 SEEN_CACHE_SIZE 时淘汰最久未出现的号码
+    返回: 新号码列表
+    """
+    fresh = []
+    with _SEEN_LOCK:
+        for number in numbers:
+            if number in _SEEN:
+                _SEEN.move_to_end(number)
+                continue
+            _SEEN[number] = None
+            fresh.append(number)
+        
+        while len(_SEEN) > SEEN_CACHE_SIZE:
+            _SEEN.popitem(last=False)
+    return fresh
+
+def matching_entries(raw_response, hits):
+    """
+    从原始响应中只取出命中号码对应的条目，用于展示
+    (完整响应含 SEARCH_QUERY_ALIASES x SEARCH_BATCH_SIZE 个条目，整段打印会把命中信息刷出屏幕)
+    """
+    # 号码此时已记入 _SEEN，解析失败也不能让命中丢失: 返回空列表，命中号码照常上报
+    try:
+        data = json.loads(raw_response)
+    except ValueError:
+        return []
+    if not isinstance(data, dict):
+        return []
+    
+    # 各别名查询共用同一组条件，同一号码可能在多个别名下重复出现，每个命中只取第一条
+    wanted = {number for number, _ in hits}
+    emitted = set()
+    entries = []
+    results = data.get('data')
+    for numbers_list in (results.values() if isinstance(results, dict) else []):
+        if not isinstance(numbers_list, list):
+            continue
+        for item in numbers_list:
+            if not isinstance(item, dict):
+                continue
+            number = item.get('phoneNumber')
+            if isinstance(number, str) and number in wanted and number not in emitted:
+                emitted.add(number)
+                entries.append(item)
+    return entries
+
 def worker_task(client):
     """单个线程的工作逻辑"""
     try:
-        # 1. 查询号码
-        number, raw_response = client.search_single_number()
+        # 1. 批量查询号码
+        numbers, raw_response, status_code = client.search_numbers_batch()
         
-        if number:
-            # 2. 检查规则
-            is_good, reason = check_number_rules(number)
-            
-            if is_good:
-                return {
-                    "status": "FOUND",
-                    "number": number,
-                    "reason": reason,
-                    "response": raw_response
-                }
-        return {"status": "RETRY"}
+        # 网络异常 / 服务端限流或报错 (后者交给限速器退避)
+        if status_code is None:
+            return {"status": "ERROR", "scanned": 0, "unique": 0}
+        if status_code == 429 or status_code >= 500:
+            return {"status": "THROTTLED", "scanned": 0, "unique": 0}
+        
+        # 2. 跳过服务端重复返回的号码
+        fresh = filter_unseen(numbers)
+        
+        # 3. 整批一次性检查规则
+        hits = check_numbers_batch(fresh)
+        
+        if hits:
+            return {
+                "status": "FOUND",
+                "hits": hits,
+                "scanned": len(numbers),
+                "unique": len(fresh),
+                # 仅在命中时才解析响应体，且只保留命中的条目
+                "entries": matching_entries(raw_response, hits)
+            }
+        return {"status": "RETRY", "scanned": len(numbers), "unique": len(fresh)}
     except Exception as e:
-        return {"status": "ERROR"}
+        return {"status": "ERROR", "scanned": 0, "unique": 0}
+
+def run_forever(client, found_queue):
+    """[常驻线程] 循环执行查询，命中结果放入队列交给主线程处理"""
+    global total_scanned, total_unique, active_requests
+    while not stop_event.is_set():
+        # 发现靓号等待用户确认期间不再发起新查询
+        allow_scanning.wait()
+        
+        # 按全局速率上限取令牌，线程之间不再有批次间的空等
+        rate_limiter.acquire(SEARCH_QUERY_ALIASES)
+        
+        # 取令牌期间可能已进入暂停，在锁内复查，保证主线程能准确等到进行中的查询归零
+        with stats_lock:
+            if not allow_scanning.is_set():
+                continue
+            active_requests += 1
+        
+        result = worker_task(client)
+        with stats_lock:
+            # 命中须在计数归零前入队，主线程等到 active_requests == 0 时即可一次取尽
+            if result["status"] == "FOUND":
+                found_queue.put(result)
+            active_requests -= 1
+            total_scanned += result["scanned"]
+            total_unique += result["unique"]
+        
+        if result["status"] == "THROTTLED":
+            rate_limiter.throttle()
+        elif result["status"] != "ERROR":
+            rate_limiter.recover()
+
+def progress_printer():
+    """[常驻线程] 每 PROGRESS_INTERVAL 秒刷新一次进度行，打印不占用工作线程与主线程"""
+    while not stop_event.wait(PROGRESS_INTERVAL):
+        with print_lock:
+            if allow_printing.is_set():
+                sys.stdout.write(f"\r[*] 正在筛选... 总计扫描: {total_scanned} 个号码 (去重后 {total_unique} 个)")
+                sys.stdout.flush()
 
 def main():
     print("=== Nova 号码高并发筛选工具 (只读模式 + 全功能代码) ===")
-    print(f"[*] 配置: 并发数 {CONCURRENT_WORKERS}, 使用 TCP 连接池复用")
-    print("[*] 策略: 发现靓号后直接打印响应体，【不自动锁定】")
+    print(f"[*] 配置: 并发数 {CONCURRENT_WORKERS}, 速率上限 {MAX_QUERIES_PER_SECOND} 次查询/秒 (约 {MAX_QUERIES_PER_SECOND / SEARCH_QUERY_ALIASES:g} 次请求/秒), 每次请求 {SEARCH_QUERY_ALIASES}x{SEARCH_BATCH_SIZE} 个号码, 使用 TCP 连接池复用")
+    print("[*] 策略: 发现靓号后直接打印命中条目，【不自动锁定】")
     print("[*] 提示: 锁定/下单相关函数已完整包含在 NovaClient 类中，如有需要可自行调用")
     print(f"[*] 自定义规则: 已加载 {len(CUSTOM_TARGETS)} 个自定义目标")
     
     client = NovaClient()
     
-    total_attempts = 0
+    # 优先让服务端按号码类型预筛选，本地规则仍作为最终判断
+    if AUTO_DISCOVER_NUMBER_TYPE:
+        available_types = client.discover_number_type()
+        if available_types is None:
+            print("[*] 未能获取服务端号码类型 (内省可能已禁用)")
+        elif available_types:
+            print(f"[*] 服务端号码类型: {', '.join(available_types)}")
+        else:
+            print("[*] 服务端号码类型不是枚举，无可选的靓号类型")
+        if client.filter_fields:
+            print(f"[*] 发现服务端筛选字段: {', '.join(client.filter_fields)} (格式未知，未自动启用，可手动加入查询条件)")
+    print(f"[*] 查询号码类型: {client.number_type}")
+    
+    # 命中结果队列: 工作线程写入，主线程负责打印与交互
+    found_queue = queue.Queue()
+    
+    # 启动常驻工作线程
+    for _ in range(CONCURRENT_WORKERS):
+        threading.Thread(target=run_forever, args=(client, found_queue), daemon=True).start()
     
-    # 使用线程池
-    with concurrent.futures.ThreadPoolExecutor(max_workers=CONCURRENT_WORKERS) as executor:
+    # 独立的进度打印线程
+    threading.Thread(target=progress_printer, daemon=True).start()
+    
+    while True:
+        # 主线程只等待命中结果
+        results = [found_queue.get()]
+
+        # 暂停查询与进度打印，防止刷屏干扰
+        allow_scanning.clear()
+        allow_printing.clear()
+        
+        # 等待进行中的查询结束，再把期间排队的命中合并成一次展示，
+        # 避免恢复后紧接着又因为暂停前已发出的查询而反复暂停
         while True:
-            # 提交一批任务
-            futures = [executor.submit(worker_task, client) for _ in range(CONCURRENT_WORKERS)]
-            
-            # 批次内计数器
-            completed_in_batch = 0
-
-            # 等待结果
-            for future in concurrent.futures.as_completed(futures):
-                result = future.result()
-                total_attempts += 1
-                completed_in_batch += 1
-                
-                # 实时打印进度条
-                if allow_printing.is_set():
-                    sys.stdout.write(f"\r[*] 正在筛选... 总计扫描: {total_attempts} 次 | 本轮进度: {completed_in_batch}/{CONCURRENT_WORKERS}")
-                    sys.stdout.flush()
-
-                if result["status"] == "FOUND":
-                    # 暂停打印进度，防止刷屏干扰
-                    allow_printing.clear()
-                    
-                    with print_lock:
-                        print("\n\n" + "="*50)
-                        print(f"[!!!] 发现符合要求的号码: {result['number']}")
-                        print(f"[!!!] 匹配规则: {result['reason']}")
-                        print("="*50)
-                        print("[+] 原始响应体 (Raw Response):")
-                        # 直接打印完整的 JSON 响应体
-                        print(json.dumps(result['response'], indent=4))
-                        print("="*50)
-                    
-                    # [交互] 暂停脚本，方便用户查看
-                    sys.stdout.flush()
-                    print(f"\n[⏸] 脚本已暂停。")
-                    user_input = input(f">>> 按 'Enter' 或 'c' 继续搜索下一个，输入 'q' 退出: ").strip().lower()
-
-                    if user_input == 'q':
-                        print("[*] 用户选择退出。")
-                        executor.shutdown(wait=False)
-                        sys.exit(0)
-                    
-                    # 默认行为(Enter/c): 恢复打印，继续搜索
-                    print("[*] 继续筛选中...")
-                    allow_printing.set()
-            
-            # 批次间隔
-            time.sleep(BATCH_DELAY)
+            with stats_lock:
+                if active_requests == 0:
+                    break
+            time.sleep(0.05)
+        while True:
+            try:
+                results.append(found_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        with print_lock:
+            print("\n\n" + "="*50)
+            entries = [entry for result in results for entry in result['entries']]
+            if entries:
+                print("[+] 命中号码的响应条目 (Raw Response):")
+                print(json.dumps(entries, indent=4))
+                print("="*50)
+            # 命中信息放在最后打印，暂停时留在屏幕上
+            for result in results:
+                for number, reason in result['hits']:
+                    print(f"[!!!] 发现符合要求的号码: {number}")
+                    print(f"[!!!] 匹配规则: {reason}")
+            print("="*50)
+        
+        # [交互] 暂停脚本，方便用户查看
+        sys.stdout.flush()
+        print(f"\n[⏸] 脚本已暂停。")
+        user_input = input(f">>> 按 'Enter' 或 'c' 继续搜索下一个，输入 'q' 退出: ").strip().lower()
+
+        if user_input == 'q':
+            print("[*] 用户选择退出。")
+            stop_event.set()
+            sys.exit(0)
+        
+        # 默认行为(Enter/c): 恢复打印，继续搜索
+        print("[*] 继续筛选中...")
+        allow_printing.set()
+        allow_scanning.set()
 
 if __name__ == "__main__":
     main()